@@ -0,0 +1,50 @@
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+""" Benchmark the start up time of short lived netboxgit invocations.
+
+Run from the repo root: python benchmarks/import_time.py [runs]
+
+Each case is run in a fresh interpreter, the median wall time is reported.
+For a per module breakdown use: python -X importtime -m netboxgit --help
+"""
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "python only": ["-c", "pass"],
+    "import netboxgit.cli": ["-c", "import netboxgit.cli"],
+    "netboxgit --help": ["-m", "netboxgit", "--help"],
+    "netboxgit status": ["-m", "netboxgit", "status"],
+    "import gitstuff, netboxdata (eager)": [
+        "-c",
+        "import netboxgit.gitstuff, netboxgit.netboxdata",
+    ],
+}
+
+
+def time_case(args, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + args,
+            cwd=REPO_ROOT,
+            stdout=subprocess.DEVNULL,
+            check=True,
+        )
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for name, args in CASES.items():
+        print(f"{name:40} {time_case(args, runs) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
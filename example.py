@@ -58,34 +58,22 @@ nbx = netboxdata.GDNetBoxer(
     url=NETBOX_URL, token=NETBOX_TOKEN, threading=True, ssl_verify=NETBOX_SSL_VERIFY
 )
 
-logger.debug("Getting interface data from NetBox")
-""" get_interfaces_data() returns a list of dicts, one per interface
-        {
-            "interface": <Interface object>
-            "mgmt_name": <string>
-            "mgmt_device": <Device object>
-            "parent_device": <Device object>
-        }
+logger.debug("Exporting NetBox objects to the repo")
+# Optional comma separated list of object types, default all registered types
+_export_types = os.environ.get("NETBOX_EXPORT_TYPES")
+export_types = _export_types.split(",") if _export_types else None
+""" export_objects() returns a dict of exported records, as read only
+CompactRecord mappings, by object type name e.g.
+{"interfaces": [...], "devices": [...]}, record.to_dict() gives a plain dict
 """
-intf_data = nbx.get_interfaces_data(NETBOX_TAG)
-if not intf_data:
+export_data = nbx.export_objects(data_path, object_types=export_types, tag=NETBOX_TAG)
+if not any(export_data.values()):
     logger.info(f"No data returned for NetBox objects tagged {NETBOX_TAG}")
 
-logger.debug("Getting device name & ip for interface data")
-devices = {}
-for intf in intf_data:
-    device = {}
-
-    device["hostname"] = intf["mgmt_device"].primary_ip.address
-    device["platform"] = intf["mgmt_device"].platform.slug
-    device_name = intf["mgmt_name"]
-    devices[device_name] = device
-
-logger.debug(f"Writing device data to {data_path}")
-nbx.write_devices_to_file(devices, data_path)
-
-logger.debug(f"Writing interface data to {data_path}")
-nbx.write_interfaces_to_file(intf_data, data_path)
+if export_data.get("interfaces"):
+    logger.debug(f"Writing device data to {data_path}")
+    devices = nbx.summarize_devices(export_data["interfaces"])
+    nbx.write_devices_to_file(devices, data_path)
 
 if gitstuff.commit_all(repo, NETBOX_TAG):
     logger.info(f"Updates committed to git branch {NETBOX_TAG}")
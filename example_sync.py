@@ -0,0 +1,56 @@
+import logging
+import os
+from pathlib import Path
+
+from netboxgit import gitstuff, netboxdata, syncservice
+
+""" Keep a Git repo in sync with NetBox objects with the specified NetBox tag,
+driven by NetBox webhooks. Configure a NetBox webhook for object create,
+update and delete events with the URL logged at start up.
+"""
+
+logger = logging.getLogger()
+log_formatter = logging.Formatter(
+    "%(asctime)s %(filename)s:%(lineno)d %(levelname)+8s: " "%(message)s",
+    datefmt="%Y-%m-%dT%H:%M:%S%Z",
+)
+s_handler = logging.StreamHandler()
+s_handler.setFormatter(log_formatter)
+logger.addHandler(s_handler)
+logger.setLevel(logging.INFO if not os.environ.get("DEBUG") else logging.DEBUG)
+
+_ssl_verify = os.environ.get("NETBOX_SSL_VERIFY", "yes").lower()
+NETBOX_SSL_VERIFY = False if _ssl_verify in ("no", "n", "false", "0") else True
+NETBOX_URL = gitstuff.get_env_variable("NETBOX_URL")  # e.g. http://ip[:port]
+NETBOX_TOKEN = gitstuff.get_env_variable("NETBOX_TOKEN")
+NETBOX_TAG = gitstuff.get_env_variable("NETBOX_TAG")
+NETBOX_WEBHOOK_SECRET = os.environ.get("NETBOX_WEBHOOK_SECRET")
+GIT_REMOTE_URL = gitstuff.get_env_variable("GIT_REMOTE_URL")
+GIT_LOCAL_PATH = gitstuff.get_env_variable("GIT_LOCAL_PATH")
+GIT_BRANCH_MAIN = gitstuff.get_env_variable("GIT_BRANCH_MAIN")
+SYNC_HOST = os.environ.get("SYNC_HOST", "127.0.0.1")
+SYNC_PORT = int(os.environ.get("SYNC_PORT", "8080"))
+
+rpo = gitstuff.clone_repo(GIT_REMOTE_URL, GIT_LOCAL_PATH)
+repo = gitstuff.load_repo(rpo.working_dir)
+
+# From <GIT_BRANCH_MAIN>, checkout a new branch named <NETBOX_TAG>
+gitstuff.prepare_branch(repo, GIT_BRANCH_MAIN, NETBOX_TAG)
+
+nbx = netboxdata.GDNetBoxer(
+    url=NETBOX_URL, token=NETBOX_TOKEN, threading=True, ssl_verify=NETBOX_SSL_VERIFY
+)
+
+service = syncservice.SyncService(
+    nbx,
+    repo,
+    Path(rpo.working_dir) / "data",
+    filters={"tag": NETBOX_TAG},
+    branch=NETBOX_TAG,
+    host=SYNC_HOST,
+    port=SYNC_PORT,
+    secret=NETBOX_WEBHOOK_SECRET,
+)
+service.serve_forever()
+
+logger.info("End")
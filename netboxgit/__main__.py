@@ -0,0 +1,5 @@
+import sys
+
+from netboxgit.cli import main
+
+sys.exit(main())
@@ -0,0 +1,268 @@
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+"""
+The netboxgit command line.
+
+Subcommands import the netboxgit modules, and so GitPython, pynetbox and
+requests, only when they run so that --help, argument errors and status
+checks start quickly. Keep module level imports here to the standard library.
+
+Options default to the same environment variables as example.py.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _ssl_verify(value):
+    return value.lower() not in ("no", "n", "false", "0")
+
+
+def _setup_logging(debug):
+    log_formatter = logging.Formatter(
+        "%(asctime)s %(filename)s:%(lineno)d %(levelname)+8s: " "%(message)s",
+        datefmt="%Y-%m-%dT%H:%M:%S%Z",
+    )
+    root_logger = logging.getLogger()
+    # Leave logging alone when main() is called again or the caller set it up
+    if not root_logger.handlers:
+        s_handler = logging.StreamHandler()
+        s_handler.setFormatter(log_formatter)
+        root_logger.addHandler(s_handler)
+    root_logger.setLevel(logging.DEBUG if debug else logging.INFO)
+
+
+def _netboxer(args):
+    from netboxgit import netboxdata
+
+    return netboxdata.GDNetBoxer(
+        url=args.netbox_url,
+        token=args.netbox_token,
+        threading=True,
+        ssl_verify=args.ssl_verify,
+    )
+
+
+def _require(parser, args, *names):
+    missing = [n for n in names if not getattr(args, n)]
+    if missing:
+        options = ", ".join("--" + n.replace("_", "-") for n in missing)
+        parser.error(f"{args.command} requires {options} or its environment variable")
+
+
+def _update_clone(repo):
+    """Fetch the remotes and fast forward the current branch to its upstream."""
+    from git.exc import GitError
+
+    if not repo.remote():
+        return
+    logger.debug("Fetching git remotes")
+    repo.fetch("--all")
+    try:
+        repo.rev_parse("--abbrev-ref", "@{upstream}")
+    except GitError:
+        return
+    repo.merge("--ff-only", "@{upstream}")
+
+
+def cmd_export(parser, args):
+    """Export NetBox objects to the git repo, then commit and push them."""
+    _require(parser, args, "netbox_url", "netbox_token", "repo")
+    if not (args.tag or args.site):
+        parser.error("export requires --tag or --site")
+    # Check before cloning or writing anything, never commit to the branch
+    # that happens to be checked out
+    branch = args.branch or args.tag
+    if args.no_commit:
+        if args.push:
+            parser.error("export --push cannot be used with --no-commit")
+    else:
+        if not branch:
+            parser.error("export requires --branch or --tag, or --no-commit")
+        _require(parser, args, "branch_from")
+
+    from netboxgit import gitstuff
+
+    repo_path = Path(args.repo)
+    if not repo_path.exists():
+        _require(parser, args, "remote_url")
+        gitstuff.clone_repo(args.remote_url, str(repo_path))
+    repo = gitstuff.load_repo(str(repo_path))
+    if not gitstuff.isclean(repo):
+        logger.error(f"git repo {repo_path} contains uncommitted changes")
+        return 1
+
+    # A reused clone may be on the branch of a previous export, new branches
+    # start from an up to date branch_from
+    if args.branch_from and branch and repo.rev_parse("--abbrev-ref", "HEAD") != branch:
+        repo.checkout(args.branch_from)
+        _update_clone(repo)
+        gitstuff.prepare_branch(repo, args.branch_from, branch)
+    else:
+        _update_clone(repo)
+
+    data_path = repo_path / "data"
+    data_path.mkdir(parents=True, exist_ok=True)
+    nbx = _netboxer(args)
+    export_data = nbx.export_objects(
+        data_path, object_types=args.types, tag=args.tag, site=args.site
+    )
+    if export_data.get("interfaces"):
+        devices = nbx.summarize_devices(export_data["interfaces"])
+        nbx.write_devices_to_file(devices, data_path)
+
+    if args.no_commit:
+        return 0
+    if not gitstuff.commit_all(repo, args.message or branch):
+        logger.info("git repo detected no changes")
+        return 0
+    logger.info("Updates committed")
+
+    if args.push:
+        results = gitstuff.push_refs(repo, [branch], args.push, atomic=args.atomic)
+        return 0 if all(result.ok for result in results.values()) else 1
+    return 0
+
+
+def cmd_restore(parser, args):
+    """Update NetBox interfaces from exported interface files."""
+    _require(parser, args, "netbox_url", "netbox_token")
+
+    nbx = _netboxer(args)
+    for path in args.paths:
+        intfs = nbx.read_interfaces_from_file(path)
+        cleaned_intfs = nbx.adapt_interfaces_for_netbox(intfs)
+        if args.dry_run:
+            for dev_name, dev_intfs in sorted(cleaned_intfs.items()):
+                for intf_name in sorted(dev_intfs):
+                    print(f"{dev_name} {intf_name}")
+            continue
+        logger.info(f"Updating interfaces from {path} to NetBox")
+        nbx.update_interfaces_to_netbox(cleaned_intfs)
+    return 0
+
+
+def cmd_diff(parser, args):
+    """Show changes to the exported data between git revisions."""
+    _require(parser, args, "repo")
+
+    from netboxgit import gitstuff
+
+    repo = gitstuff.load_repo(args.repo)
+    options = ["--stat"] if args.stat else []
+    print(repo.diff(*options, *args.revisions, "--", "data"))
+    return 0
+
+
+def cmd_status(parser, args):
+    """Show the configuration and the state of the git repo."""
+    print(f"NetBox URL:    {args.netbox_url or '(not set)'}")
+    print(f"NetBox token:  {'set' if args.netbox_token else '(not set)'}")
+    print(f"NetBox tag:    {args.tag or '(not set)'}")
+    print(f"Git repo:      {args.repo or '(not set)'}")
+    if not args.repo or not Path(args.repo).exists():
+        return 0
+
+    from netboxgit import gitstuff
+
+    from git.exc import GitError
+
+    repo = gitstuff.load_repo(args.repo)
+    try:
+        branch = repo.symbolic_ref("--short", "HEAD")
+    except GitError:
+        branch = f"(detached at {repo.rev_parse('--short', 'HEAD')})"
+    print(f"Git branch:    {branch}")
+    print(f"Git clean:     {gitstuff.isclean(repo)}")
+    return 0 if gitstuff.isclean(repo) else 1
+
+
+def build_parser():
+    """Return the argument parser for the netboxgit command."""
+    env = os.environ.get
+
+    parser = argparse.ArgumentParser(
+        prog="netboxgit", description="Manage NetBox data into Git version control."
+    )
+    parser.add_argument(
+        "--debug", action="store_true", default=bool(env("DEBUG")), help="debug logs"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    subparsers.required = True
+
+    netbox_opts = argparse.ArgumentParser(add_help=False)
+    netbox_opts.add_argument(
+        "--netbox-url", default=env("NETBOX_URL"), help="NETBOX_URL"
+    )
+    netbox_opts.add_argument(
+        "--netbox-token", default=env("NETBOX_TOKEN"), help="NETBOX_TOKEN"
+    )
+    netbox_opts.add_argument(
+        "--ssl-verify",
+        type=_ssl_verify,
+        default=_ssl_verify(env("NETBOX_SSL_VERIFY", "yes")),
+        help="NETBOX_SSL_VERIFY",
+    )
+    netbox_opts.add_argument("--tag", default=env("NETBOX_TAG"), help="NETBOX_TAG")
+
+    git_opts = argparse.ArgumentParser(add_help=False)
+    git_opts.add_argument(
+        "--repo", default=env("GIT_LOCAL_PATH"), help="GIT_LOCAL_PATH"
+    )
+
+    export = subparsers.add_parser(
+        "export", parents=[netbox_opts, git_opts], help=cmd_export.__doc__
+    )
+    export.add_argument("--site", help="export objects of this NetBox site slug")
+    export.add_argument(
+        "--types", nargs="+", help="object types to export, default all"
+    )
+    export.add_argument(
+        "--remote-url", default=env("GIT_REMOTE_URL"), help="GIT_REMOTE_URL"
+    )
+    export.add_argument(
+        "--branch-from", default=env("GIT_BRANCH_MAIN"), help="GIT_BRANCH_MAIN"
+    )
+    export.add_argument("--branch", help="branch to commit to, default the tag")
+    export.add_argument("--message", help="commit message, default the branch")
+    export.add_argument("--no-commit", action="store_true", help="only write files")
+    export.add_argument("--push", nargs="+", metavar="REMOTE", help="push to remotes")
+    export.add_argument("--atomic", action="store_true", help="git push --atomic")
+    export.set_defaults(func=cmd_export)
+
+    restore = subparsers.add_parser(
+        "restore", parents=[netbox_opts], help=cmd_restore.__doc__
+    )
+    restore.add_argument("paths", nargs="+", help="directories of interface files")
+    restore.add_argument(
+        "--dry-run", action="store_true", help="list interfaces, do not update"
+    )
+    restore.set_defaults(func=cmd_restore)
+
+    diff = subparsers.add_parser("diff", parents=[git_opts], help=cmd_diff.__doc__)
+    diff.add_argument(
+        "revisions", nargs="*", default=["HEAD"], help="git revisions, default HEAD"
+    )
+    diff.add_argument("--stat", action="store_true", help="git diff --stat")
+    diff.set_defaults(func=cmd_diff)
+
+    status = subparsers.add_parser(
+        "status", parents=[netbox_opts, git_opts], help=cmd_status.__doc__
+    )
+    status.set_defaults(func=cmd_status)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _setup_logging(args.debug)
+    return args.func(parser, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
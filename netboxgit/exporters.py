@@ -0,0 +1,283 @@
+import logging
+from pathlib import PurePosixPath
+
+"""
+Registry of NetBox object exporters.
+
+Each exporter describes one NetBox object type: the pynetbox endpoint to
+read it from, the query filters it accepts, where its JSON files go in the
+repo and which keys/values to strip before writing. The shared engine that
+runs them lives in :meth:`netboxgit.netboxdata.GDNetBoxer.export_objects`.
+
+Path layouts are ``str.format`` templates relative to the data directory,
+filled in from the fields returned by the exporter's ``path_fields``
+function. Each record must get its own path, NetBox allows duplicate IP
+addresses, prefixes and VLANs so their layouts include the object id. Registering an exporter under an existing name replaces it, which
+is how a controlling script can change a layout or cleaning rule.
+"""
+
+logger = logging.getLogger(__name__)
+
+EXPORTERS = {}
+
+
+class Exporter:
+    """Description of how to export one NetBox object type to files.
+
+    :param name: Registry name of the object type, e.g. "interfaces"
+    :type name: str
+    :param endpoint: Dotted pynetbox endpoint, e.g. "dcim.interfaces"
+    :type endpoint: str
+    :param content_type: NetBox change log object type, e.g. "dcim.interface"
+    :type content_type: str
+    :param path_layout: Format string for the file path of each object
+    :type path_layout: str
+    :param path_fields: Callable(record, index) returning the layout fields
+    :type path_fields: callable
+    :param filter_keys: Query filters the endpoint accepts
+    :type filter_keys: tuple
+    :param unwanted_keys: Keys removed (recursively) before writing
+    :type unwanted_keys: tuple
+    :param unwanted_values: Items with these values removed before writing
+    :type unwanted_values: tuple
+    """
+
+    def __init__(
+        self,
+        name,
+        endpoint,
+        content_type,
+        path_layout,
+        path_fields,
+        filter_keys=("tag",),
+        unwanted_keys=(),
+        unwanted_values=(),
+    ):
+        self.name = name
+        self.endpoint = endpoint
+        self.content_type = content_type
+        self.path_layout = path_layout
+        self.path_fields = path_fields
+        self.filter_keys = tuple(filter_keys)
+        self.unwanted_keys = list(unwanted_keys)
+        self.unwanted_values = list(unwanted_values)
+
+    def __repr__(self):
+        return f"<Exporter {self.name} {self.endpoint}>"
+
+    def filters(self, **filters):
+        """Return only the filters this object type's endpoint accepts."""
+        return {
+            k: v for k, v in filters.items() if k in self.filter_keys and v is not None
+        }
+
+    def path_glob(self):
+        """Return a glob pattern matching the file path of any record.
+
+        Each path component holding a field matches any name, so files
+        written by an older layout of the same depth match too.
+        """
+        parts = self.path_layout.split("/")
+        glob = ["*" if "{" in part else part for part in parts[:-1]]
+        glob.append("*" + PurePosixPath(parts[-1]).suffix)
+        return "/".join(glob)
+
+    def file_path(self, record, index):
+        """Return the relative file path for a record.
+
+        Forward slashes in field values clash with the filesystem path so are
+        replaced, as for interface names.
+        """
+        fields = {
+            k: str(v).replace("/", "-")
+            for k, v in self.path_fields(record, index).items()
+        }
+        return self.path_layout.format(**fields)
+
+
+def register_exporter(exporter):
+    """Add an exporter to the registry, replacing any of the same name."""
+    logger.debug(f"Registering exporter {exporter!r}")
+    EXPORTERS[exporter.name] = exporter
+    return exporter
+
+
+def get_exporter(name):
+    """Return the registered exporter for a NetBox object type name."""
+    try:
+        return EXPORTERS[name]
+    except KeyError:
+        msg = f"No exporter registered for NetBox object type '{name}'"
+        logger.error(msg)
+        raise ValueError(msg)
+
+
+def ref_name(ref, key="name", default="global"):
+    """Return a field of a nested object reference or a default if unset."""
+    if not ref:
+        return default
+    return ref.get(key) or default
+
+
+def mgmt_name(device):
+    """Return the external name of a device, the virtual chassis name if any."""
+    virtual_chassis = device.get("virtual_chassis")
+    if virtual_chassis:
+        return virtual_chassis["name"]
+    return device["name"]
+
+
+def device_mgmt_name(ref, index):
+    """Resolve a nested device reference to its management name.
+
+    The nested reference carries no virtual chassis data so the full device
+    is looked up in the in-memory index built by the export engine.
+    """
+    if not ref:
+        return "unassigned"
+    device = index["devices"].get(ref["id"], ref)
+    return mgmt_name(device)
+
+
+def _device_fields(record, index):
+    return {"mgmt_name": mgmt_name(record), "name": record["name"]}
+
+
+def _interface_fields(record, index):
+    return {
+        "mgmt_name": device_mgmt_name(record["device"], index),
+        "name": record["name"],
+    }
+
+
+def _ip_address_fields(record, index):
+    return {
+        "vrf": ref_name(record.get("vrf")),
+        "address": record["address"],
+        "id": record["id"],
+    }
+
+
+def _vlan_fields(record, index):
+    return {
+        "site": ref_name(record.get("site")),
+        "vid": record["vid"],
+        "name": record["name"],
+        "id": record["id"],
+    }
+
+
+def _prefix_fields(record, index):
+    return {
+        "vrf": ref_name(record.get("vrf")),
+        "prefix": record["prefix"],
+        "id": record["id"],
+    }
+
+
+def _cable_fields(record, index):
+    return {"id": record["id"]}
+
+
+def _circuit_fields(record, index):
+    return {"provider": ref_name(record.get("provider")), "cid": record["cid"]}
+
+
+# Object types whose changes alter the files of other object types, see
+# GDNetBoxer.apply_changes()
+RELATED_CONTENT_TYPES = (
+    "dcim.device",
+    "dcim.virtualchassis",
+    "dcim.site",
+    "ipam.vrf",
+    "circuits.provider",
+)
+
+# Keys of nested references whose name a path layout uses, by the object type
+# referred to. Records referring to a changed object are retrieved again.
+PATH_REFERENCES = {
+    "dcim.virtualchassis": "virtual_chassis",
+    "dcim.site": "site",
+    "ipam.vrf": "vrf",
+    "circuits.provider": "provider",
+}
+
+# Keys NetBox will not accept back in, see adapt_interfaces_for_netbox()
+NETBOX_ONLY_KEYS = ("url", "display_name")
+
+register_exporter(
+    Exporter(
+        "devices",
+        "dcim.devices",
+        "dcim.device",
+        "devices/{mgmt_name}/{name}.json",
+        _device_fields,
+        filter_keys=("tag", "site"),
+        unwanted_keys=NETBOX_ONLY_KEYS,
+    )
+)
+# Interfaces keep the full record for compatibility with existing repos
+register_exporter(
+    Exporter(
+        "interfaces",
+        "dcim.interfaces",
+        "dcim.interface",
+        "devices/{mgmt_name}/interfaces/{name}.json",
+        _interface_fields,
+        filter_keys=("tag", "site"),
+    )
+)
+register_exporter(
+    Exporter(
+        "ip_addresses",
+        "ipam.ip_addresses",
+        "ipam.ipaddress",
+        "ip-addresses/{vrf}/{address}_{id}.json",
+        _ip_address_fields,
+        unwanted_keys=NETBOX_ONLY_KEYS,
+    )
+)
+register_exporter(
+    Exporter(
+        "vlans",
+        "ipam.vlans",
+        "ipam.vlan",
+        "vlans/{site}/{vid}-{name}_{id}.json",
+        _vlan_fields,
+        filter_keys=("tag", "site"),
+        unwanted_keys=NETBOX_ONLY_KEYS,
+    )
+)
+register_exporter(
+    Exporter(
+        "prefixes",
+        "ipam.prefixes",
+        "ipam.prefix",
+        "prefixes/{vrf}/{prefix}_{id}.json",
+        _prefix_fields,
+        filter_keys=("tag", "site"),
+        unwanted_keys=NETBOX_ONLY_KEYS,
+    )
+)
+register_exporter(
+    Exporter(
+        "cables",
+        "dcim.cables",
+        "dcim.cable",
+        "cables/{id}.json",
+        _cable_fields,
+        filter_keys=("tag", "site"),
+        unwanted_keys=NETBOX_ONLY_KEYS,
+    )
+)
+register_exporter(
+    Exporter(
+        "circuits",
+        "circuits.circuits",
+        "circuits.circuit",
+        "circuits/{provider}/{cid}.json",
+        _circuit_fields,
+        filter_keys=("tag", "site"),
+        unwanted_keys=NETBOX_ONLY_KEYS,
+    )
+)
@@ -2,6 +2,8 @@ import logging
 import os
 import sys
 import textwrap
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 import git
 from git.exc import GitError
@@ -19,6 +21,40 @@ later if more complex git operations are needed to find diffs etc.
 
 logger = logging.getLogger(__name__)
 
+# git push --porcelain status flags
+PUSH_FLAGS = {
+    " ": "fast-forward",
+    "+": "forced update",
+    "-": "deleted",
+    "*": "new ref",
+    "!": "rejected",
+    "=": "up to date",
+}
+
+
+class RefPushStatus(namedtuple("RefPushStatus", "flag src dst summary reason")):
+    """Status of one ref from the output of git push --porcelain."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.flag != "!"
+
+    @property
+    def status(self):
+        return PUSH_FLAGS.get(self.flag, "unknown")
+
+
+class PushResult(namedtuple("PushResult", "remote exit_status refs stderr")):
+    """Result of a git push to one remote, refs is a list of RefPushStatus."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.exit_status == 0 and all(ref.ok for ref in self.refs)
+
 
 def get_env_variable(env_var):
     try:
@@ -186,21 +222,87 @@ def push_branch(repo, branch_name, remote="origin"):
     :param remote: The name of the git remote to push to
     :type remote: str
     """
-    try:
-        push_out_raw = repo.push("--porcelain", remote, branch_name)
-    except GitError as exc:
-        logger.error(str(exc))
-        raise exc
-
-    bad_words = ["failed", "error", "rejected"]
+    result = push_refs(repo, [branch_name], [remote])[remote]
 
-    if any([word in push_out_raw.lower() for word in bad_words]):
-        [logger.error(eline) for eline in push_out_raw.splitlines()]
+    if not result.ok:
         raise RuntimeError(
             f"Bad response detected in the output of 'git push {remote} {branch_name}'"
         )
 
-    logger.debug(push_out_raw.splitlines())
+
+def parse_push_porcelain(push_out):
+    """Parse the per ref status lines of git push --porcelain output.
+
+    Each ref line is "<flag> TAB <from>:<to> TAB <summary> (<reason>)", the
+    "To <url>" and "Done" lines are skipped.
+
+    :param push_out: stdout of git push --porcelain
+    :type push_out: str
+    :return: Status of each ref
+    :rtype: list of :class:`RefPushStatus`
+    """
+    ref_statuses = []
+    for line in push_out.splitlines():
+        fields = line.split("\t")
+        if len(fields) != 3 or len(fields[0]) != 1:
+            continue
+        flag, refspec, summary = fields
+        src, _, dst = refspec.partition(":")
+        reason = None
+        if summary.endswith(")") and " (" in summary:
+            summary, _, reason = summary[:-1].partition(" (")
+        ref_statuses.append(RefPushStatus(flag, src, dst, summary, reason))
+    return ref_statuses
+
+
+def _push_to_remote(repo, remote, refs, atomic):
+    args = ["--porcelain"] + (["--atomic"] if atomic else []) + [remote] + refs
+    logger.debug(f"git push {' '.join(args)}")
+    exit_status, push_out, push_err = repo.push(
+        *args, with_extended_output=True, with_exceptions=False
+    )
+    return PushResult(remote, exit_status, parse_push_porcelain(push_out), push_err)
+
+
+def push_refs(repo, refs, remotes=("origin",), atomic=False):
+    """Perform git push of the given refs to each remote at the same time.
+
+    All refs go to a remote in a single git push, so one round trip per
+    remote.
+
+    :param repo: The repo to operate on
+    :type repo: :class:`git.cmd.Git`
+    :param refs: The git refs (or refspecs) to push
+    :type refs: list or str
+    :param remotes: The names of the git remotes to push to
+    :type remotes: list or str
+    :param atomic: Either all refs are updated on a remote or none are
+    :type atomic: bool
+    :return: Result by remote name
+    :rtype: dict of :class:`PushResult`
+    """
+    # A single ref or remote name may be given as a plain string
+    refs = [refs] if isinstance(refs, str) else list(refs)
+    remotes = [remotes] if isinstance(remotes, str) else list(remotes)
+    with ThreadPoolExecutor(max_workers=len(remotes) or 1) as pool:
+        pushes = {
+            remote: pool.submit(_push_to_remote, repo, remote, refs, atomic)
+            for remote in remotes
+        }
+        results = {remote: push.result() for remote, push in pushes.items()}
+
+    for result in results.values():
+        for ref in result.refs:
+            msg = f"{result.remote} {ref.dst} {ref.status} {ref.summary} {ref.reason}"
+            if ref.ok:
+                logger.debug(msg)
+            else:
+                logger.error(msg)
+        if not result.ok:
+            logger.error(f"git push to {result.remote} failed")
+            for eline in result.stderr.splitlines():
+                logger.error(eline)
+    return results
 
 
 def delete_branch(repo, branch_name):
@@ -1,12 +1,26 @@
 import json
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import pynetbox
 import requests
 
+from netboxgit import exporters, records
+
 logger = logging.getLogger(__name__)
 
+# Max object ids per bulk lookup request, keeps the query string a sane length
+ID_CHUNK_SIZE = 200
+
+# The NetBox object change log and the content types its entries refer to
+CHANGELOG_ENDPOINT = "extras.object_changes"
+CONTENT_TYPES_ENDPOINT = "extras.content_types"
+
+# Max passes over the change log made by a consistent export before giving up
+MAX_RECONCILE_ROUNDS = 3
+
 
 class GDNetBoxer:
     """"""
@@ -21,6 +35,8 @@ class GDNetBoxer:
         self.nb = pynetbox.api(self.url, token=self.token, threading=self.threading)
         self.nb.http_session = requests.Session()
         self.nb.http_session.verify = True if ssl_verify else False
+        self.content_type_ids = {}
+        self.changelog_position = None
 
     def _fix_for_filename(self, in_filename):
         """Replace path separator character in name."""
@@ -62,10 +78,33 @@ class GDNetBoxer:
             if k not in keys_to_del
         }
 
+    def _endpoint(self, dotted_name):
+        """Return the pynetbox endpoint for a name such as "dcim.devices"."""
+        app_name, endpoint_name = dotted_name.split(".")
+        return getattr(getattr(self.nb, app_name), endpoint_name)
+
+    def _get_by_ids(self, dotted_name, ids, **filters):
+        """Get NetBox objects by id in as few requests as possible.
+
+        :param dotted_name: The pynetbox endpoint, e.g. "dcim.devices"
+        :type dotted_name: str
+        :param ids: The object ids to retrieve
+        :type ids: iterable
+        :param filters: Further NetBox query filters the objects must match
+        :return: pynetbox objects
+        :rtype: list
+        """
+        endpoint = self._endpoint(dotted_name)
+        ids = sorted(ids)
+        objects = []
+        for i in range(0, len(ids), ID_CHUNK_SIZE):
+            objects.extend(endpoint.filter(id=ids[i : i + ID_CHUNK_SIZE], **filters))
+        return objects
+
     def get_tag_from_netbox(self, tag_name=""):
         """Retrieve the named NetBox tag data."""
         self.tag_name = tag_name
-        self.tag_data = self.nb.extras.tags.filter(name=self.tag_name)
+        self.tag_data = list(self.nb.extras.tags.filter(name=self.tag_name))
         logger.debug(f"Tag data received from Netbox: {self.tag_data}")
         assert (
             len(self.tag_data) == 1
@@ -137,20 +176,22 @@ class GDNetBoxer:
     def read_interfaces_from_file(self, input_path):
         """Read interface JSON file(s) into a dictionary.
 
+        The interfaces are held as :class:`netboxgit.records.CompactRecord`
+        so nested objects repeated across files are stored once.
+
         :param input_path: Source directory of files to read
         :type input_path: string
-        :return: build_dict
+        :return: build_dict, interface records by name by device name
         :rtype: dict
         """
         files_path = Path(input_path)
-        # FIXME(GD) Use input parameter once prototyping completed.
-        files_path = Path("/Users/gdanielson/repos/netbdata/d/interfaces")
         files = [i for i in files_path.iterdir() if i.is_file()]
         build_dict = {}
+        store = records.RecordStore()
 
         for file in files:
             with open(file, "r") as f:
-                this = json.loads(f.read())
+                this = store.compact(json.loads(f.read()))
             dev_name = this["device"]["name"]
             if dev_name not in build_dict:
                 build_dict[dev_name] = {}
@@ -192,12 +233,18 @@ class GDNetBoxer:
         unwanted_dict_keys = ["display_name", "url"]
         unwanted_dict_values = []  # remove keys with these values
 
-        for intfs in objects.values():
-            for intf in intfs.values():
+        # One interface at a time is expanded to a dict to keep memory down
+        store = records.RecordStore()
+        cleaned_objects = {}
+        for dev_name, intfs in objects.items():
+            cleaned_objects[dev_name] = {}
+            for intf_name, intf in intfs.items():
+                intf = records.to_dict(intf)
                 intf["type"] = intf["type"]["id"]
-
-        cleaned_objects = self._del_items_with_value(objects, unwanted_dict_values)
-        return self._del_keys_from_dict(cleaned_objects, unwanted_dict_keys)
+                cleaned_objects[dev_name][intf_name] = store.compact(
+                    intf, unwanted_dict_keys, unwanted_dict_values
+                )
+        return cleaned_objects
 
     def update_interfaces_to_netbox(self, dev_intf_data):
         """Write interface data to NetBox.
@@ -220,14 +267,14 @@ class GDNetBoxer:
             try:
                 for nbx_intf in nbx_intfs:
                     assert nbx_intf.update(
-                        intfs[nbx_intf.name]
+                        records.to_dict(intfs[nbx_intf.name])
                     ), f"Error detected while updating {dev_name} {nbx_intf.name} to NetBox"
             except AssertionError as error:
                 logger.exception(error)
             except Exception as exc:  # unexpected exception
                 logger.exception(exc, False)
 
-    def get_interface_device_data(self, in_intf):
+    def get_interface_device_data(self, in_intf, devices=None):
         """Get the contained device and the management device of an
         interface.
 
@@ -238,6 +285,9 @@ class GDNetBoxer:
 
         :param in_intf: A NetBox interface object to process
         :type in_intf: `dcim.Interfaces`
+        :param devices: Optional index of device objects by id, devices not in
+            the index are retrieved from NetBox
+        :type devices: dict
         :return: mgmt_name The external name of the device or virtual chassis
         :rtype: str
         :return: mgmt_device The device to connect to manage it
@@ -247,12 +297,17 @@ class GDNetBoxer:
         :return: mgmt_name, mgmt_device, parent_device
         :rtype: tuple
         """
+        devices = {} if devices is None else devices
 
         try:
             # an interface object has an attribute named "device"
-            parent_device = self.nb.dcim.devices.get(in_intf.device.id)
+            device_id = in_intf.device.id
         except AttributeError:
             logger.exception(f"ERROR getting device for {str(in_intf)}")
+            raise
+        if device_id not in devices:
+            devices[device_id] = self.nb.dcim.devices.get(device_id)
+        parent_device = devices[device_id]
 
         # Use virtchassis mgmt info if it exists
         try:
@@ -263,12 +318,41 @@ class GDNetBoxer:
         else:
             mgmt_name = str(parent_device.virtual_chassis.name)
 
-        # pynetbox child object references hold minimal data by default
-        if not mgmt_device.has_details:
+        # Devices in the index came from a list or get request so hold their
+        # full details, pynetbox child object references hold minimal data
+        if mgmt_device.id in devices:
+            mgmt_device = devices[mgmt_device.id]
+        elif not mgmt_device.has_details:
             mgmt_device.full_details()
 
         return mgmt_name, mgmt_device, parent_device
 
+    def get_devices_index(self, interfaces):
+        """Get the devices, and their virtchassis masters, for interfaces.
+
+        The devices are retrieved in bulk rather than one request per
+        interface.
+
+        :param interfaces: NetBox interface objects
+        :type interfaces: list
+        :return: Device objects by id
+        :rtype: dict
+        """
+        devices = {}
+        device_ids = {intf.device.id for intf in interfaces if intf.device}
+        for device in self._get_by_ids("dcim.devices", device_ids):
+            devices[device.id] = device
+
+        master_ids = {
+            device.virtual_chassis.master.id
+            for device in devices.values()
+            if device.virtual_chassis and device.virtual_chassis.master
+        }
+        for device in self._get_by_ids("dcim.devices", master_ids - devices.keys()):
+            devices[device.id] = device
+
+        return devices
+
     def get_interfaces_data(self, nbx_tag):
         """Get the required device info for NetBox tagged interfaces.
 
@@ -282,7 +366,8 @@ class GDNetBoxer:
         ]
         """
         interfaces_data = []
-        list_of_interfaces = self.get_interfaces_for_tag(nbx_tag)
+        list_of_interfaces = list(self.get_interfaces_for_tag(nbx_tag))
+        devices = self.get_devices_index(list_of_interfaces)
 
         for intf in list_of_interfaces:
 
@@ -290,7 +375,7 @@ class GDNetBoxer:
                 mgmt_name,
                 mgmt_device,
                 parent_device,
-            ) = self.get_interface_device_data(intf)
+            ) = self.get_interface_device_data(intf, devices)
 
             # build an interfaces_data record
             interfaces_data.append(
@@ -304,6 +389,420 @@ class GDNetBoxer:
 
         return interfaces_data
 
+    def _fetch_objects(self, exporter, filters, store, ids=None):
+        """Get the NetBox objects for one exporter as cleaned compact records.
+
+        If ids is given only the objects with those ids that match the
+        filters are retrieved.
+        """
+        exporter_filters = exporter.filters(**filters)
+        if not exporter_filters:
+            logger.warning(
+                f"Skipping {exporter.name}, none of the filters {list(filters)} apply"
+            )
+            return []
+
+        logger.debug(f"Getting {exporter.name} from NetBox {exporter_filters}")
+        if ids is None:
+            objects = self._endpoint(exporter.endpoint).filter(**exporter_filters)
+        else:
+            objects = self._get_by_ids(exporter.endpoint, ids, **exporter_filters)
+        return [
+            store.compact(dict(obj), exporter.unwanted_keys, exporter.unwanted_values)
+            for obj in objects
+        ]
+
+    def _build_export_index(self, results, store, devices=None):
+        """Index the objects related to the exported records by id.
+
+        Devices referenced by exported records but not themselves exported,
+        and virtchassis masters, are retrieved in bulk so that relationships
+        are resolved from memory rather than one request per object.
+
+        :param results: Exported records by object type name
+        :type results: dict
+        :param store: The store to compact the related records with
+        :type store: :class:`netboxgit.records.RecordStore`
+        :param devices: Devices already indexed by id, to add to
+        :type devices: dict
+        :return: Related records by object type name then id
+        :rtype: dict
+        """
+        devices = dict(devices or {})
+        devices.update((dev["id"], dev) for dev in results.get("devices", []))
+
+        device_ids = {
+            record["device"]["id"]
+            for records in results.values()
+            for record in records
+            if record.get("device")
+        }
+        for device in self._get_by_ids("dcim.devices", device_ids - devices.keys()):
+            devices[device.id] = store.compact(dict(device))
+
+        master_ids = {
+            dev["virtual_chassis"]["master"]["id"]
+            for dev in devices.values()
+            if dev.get("virtual_chassis") and dev["virtual_chassis"].get("master")
+        }
+        for device in self._get_by_ids("dcim.devices", master_ids - devices.keys()):
+            devices[device.id] = store.compact(dict(device))
+
+        return {"devices": devices}
+
+    def _write_records(self, exporter, records, index, base_path):
+        """Write each record to its JSON file under base_path.
+
+        :return: The number of files written
+        :rtype: int
+        """
+        made_dirs = set()
+        for record in records:
+            fout = Path(base_path / exporter.file_path(record, index))
+            if fout.parent not in made_dirs:
+                fout.parent.mkdir(parents=True, exist_ok=True)
+                made_dirs.add(fout.parent)
+
+            # records were cleaned when fetched
+            with open(fout, "w") as f:
+                f.write(json.dumps(record.to_dict(), sort_keys=True, indent=4))
+        return len(records)
+
+    def export_objects(
+        self,
+        base_path,
+        object_types=None,
+        max_workers=None,
+        consistent=True,
+        store=None,
+        **filters,
+    ):
+        """Export NetBox objects of several types to JSON files.
+
+        All object types are retrieved from NetBox at the same time, then
+        related objects are indexed and all object types written at the same
+        time. See :mod:`netboxgit.exporters` for the object types, path
+        layouts and cleaning rules.
+
+        NetBox may be edited while the export runs. When consistent is True
+        the change log position is recorded first, then once everything is
+        written only the objects changed since are retrieved again and their
+        files rewritten, see :meth:`reconcile_changes`.
+
+        :param base_path: The filesystem location for config data
+        :type base_path: `pathlib.Path`
+        :param object_types: Registered exporter names, default all
+        :type object_types: list
+        :param max_workers: Max threads, default one per object type
+        :type max_workers: int
+        :param consistent: Re-export objects changed during the export
+        :type consistent: bool
+        :param store: The store to compact the records with, default a new one
+        :type store: :class:`netboxgit.records.RecordStore`
+        :param filters: NetBox query filters e.g. tag="x", site="y"
+        :return: Exported records, as
+            :class:`netboxgit.records.CompactRecord`, by object type name
+        :rtype: dict
+        """
+        if not any(filters.values()):
+            msg = "A NetBox filter e.g. tag or site must be given."
+            logger.error(msg)
+            raise ValueError(msg)
+
+        if object_types is None:
+            object_types = list(exporters.EXPORTERS)
+        if not object_types:
+            msg = "At least one NetBox object type must be given to export."
+            logger.error(msg)
+            raise ValueError(msg)
+        selected = [exporters.get_exporter(name) for name in object_types]
+        if store is None:
+            store = records.RecordStore()
+
+        self.changelog_position = None
+        position = None
+        if consistent:
+            try:
+                position = self.get_changelog_position()
+            except Exception as exc:
+                logger.warning("Change log unavailable, export may be inconsistent")
+                logger.warning(exc.__repr__())
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(selected)) as pool:
+            fetches = {
+                exp.name: pool.submit(self._fetch_objects, exp, filters, store)
+                for exp in selected
+            }
+            results = {name: fetch.result() for name, fetch in fetches.items()}
+
+            self.export_index = self._build_export_index(results, store)
+            # Fail before writing anything if records would share a file
+            self.export_paths(selected, results, self.export_index)
+
+            writes = {
+                exp.name: pool.submit(
+                    self._write_records,
+                    exp,
+                    results[exp.name],
+                    self.export_index,
+                    base_path,
+                )
+                for exp in selected
+            }
+            for name, write in writes.items():
+                logger.info(f"Wrote {write.result()} {name} to {base_path}")
+
+        if position is not None:
+            try:
+                self.changelog_position = self.reconcile_changes(
+                    selected, filters, results, store, base_path, position
+                )
+            except Exception as exc:
+                logger.warning("Change log unavailable, export may be inconsistent")
+                logger.warning(exc.__repr__())
+
+        return results
+
+    def get_changelog_position(self):
+        """Return the id of the latest NetBox object change, 0 if none.
+
+        :return: Object change id
+        :rtype: int
+        """
+        changelog = self._endpoint(CHANGELOG_ENDPOINT)
+        # pynetbox >= 6.3 returns only the first page when given an offset
+        for change in changelog.filter(ordering="-id", limit=1, offset=0):
+            return change.id
+        return 0
+
+    def get_content_type_ids(self, content_types):
+        """Get the NetBox ids of content types such as "dcim.interface".
+
+        All content types are retrieved once and then cached.
+
+        :param content_types: Content type names, "<app_label>.<model>"
+        :type content_types: iterable
+        :return: Content type ids
+        :rtype: list
+        """
+        if not self.content_type_ids:
+            for ct in self._endpoint(CONTENT_TYPES_ENDPOINT).all():
+                self.content_type_ids[f"{ct.app_label}.{ct.model}"] = ct.id
+
+        ids = []
+        for content_type in content_types:
+            if content_type not in self.content_type_ids:
+                logger.warning(f"Unknown NetBox content type {content_type}")
+                continue
+            ids.append(self.content_type_ids[content_type])
+        return sorted(ids)
+
+    def get_changes_since(self, position, content_types):
+        """Get the NetBox object changes made after a change log position.
+
+        :param position: Object change id, as from get_changelog_position()
+        :type position: int
+        :param content_types: Only changes to these content types, e.g.
+            ["dcim.interface"]
+        :type content_types: iterable
+        :return: pynetbox object change objects, oldest first
+        :rtype: list
+        """
+        content_type_ids = self.get_content_type_ids(content_types)
+        if not content_type_ids:
+            return []
+        changelog = self._endpoint(CHANGELOG_ENDPOINT)
+        return list(
+            changelog.filter(
+                id__gt=position,
+                changed_object_type_id=content_type_ids,
+                ordering="id",
+            )
+        )
+
+    def export_paths(self, selected, results, index):
+        """Return the file path of every exported record by (type name, id).
+
+        :raises ValueError: If two records have the same path, one would
+            overwrite the other's file
+        """
+        paths = {}
+        owners = {}
+        for exp in selected:
+            for record in results[exp.name]:
+                key = (exp.name, record["id"])
+                path = exp.file_path(record, index)
+                if path in owners:
+                    msg = f"{key} and {owners[path]} have the same file path {path}"
+                    logger.error(msg)
+                    raise ValueError(msg)
+                owners[path] = key
+                paths[key] = path
+        return paths
+
+    def existing_paths(self, selected, base_path):
+        """Return the files under base_path laid out as by the exporters.
+
+        :param selected: The exporters to find the files of
+        :type selected: list
+        :param base_path: The filesystem location for config data
+        :type base_path: `pathlib.Path`
+        :return: The paths, relative to base_path, of the files found
+        :rtype: set
+        """
+        return {
+            path.relative_to(base_path).as_posix()
+            for exp in selected
+            for path in Path(base_path).glob(exp.path_glob())
+            if path.is_file()
+        }
+
+    def apply_changes(self, selected, filters, results, store, base_path, changed):
+        """Bring exported files up to date with a set of changed objects.
+
+        Objects of the exported types that changed, or that refer to a
+        changed site, VRF, provider or virtchassis, are retrieved again, see
+        :data:`netboxgit.exporters.PATH_REFERENCES`. Devices related to
+        exported objects are re-indexed if they or their virtchassis changed. Files are rewritten for the changed records and
+        for records whose path changed, files of records deleted or no longer
+        matching the filters are removed.
+
+        :param selected: The exporters that were run
+        :type selected: list
+        :param filters: The NetBox query filters the export used
+        :type filters: dict
+        :param results: Exported records by object type name, updated in place
+        :type results: dict
+        :param store: The store the records were compacted with
+        :type store: :class:`netboxgit.records.RecordStore`
+        :param base_path: The filesystem location for config data
+        :type base_path: `pathlib.Path`
+        :param changed: Changed object ids by change log object type, e.g.
+            {"dcim.interface": {11, 12}}
+        :type changed: dict
+        :return: The paths, relative to base_path, written or removed
+        :rtype: set
+        """
+        old_index = self.export_index
+        old_paths = self.export_paths(selected, results, old_index)
+
+        refetched = {}
+        for exp in selected:
+            ids = set(changed.get(exp.content_type, ()))
+            for content_type, key in exporters.PATH_REFERENCES.items():
+                ref_ids = changed.get(content_type)
+                if ref_ids:
+                    ids.update(
+                        record["id"]
+                        for record in results[exp.name]
+                        if (record.get(key) or {}).get("id") in ref_ids
+                    )
+            refetched[exp.name] = ids
+            if not ids:
+                continue
+            fresh = self._fetch_objects(exp, filters, store, ids=ids)
+            results[exp.name] = [
+                record for record in results[exp.name] if record["id"] not in ids
+            ] + fresh
+
+        # Drop changed devices from the index so they are retrieved again
+        devices = {
+            dev_id: dev
+            for dev_id, dev in old_index["devices"].items()
+            if dev_id not in changed.get("dcim.device", ())
+            and (dev.get("virtual_chassis") or {}).get("id")
+            not in changed.get("dcim.virtualchassis", ())
+        }
+        self.export_index = self._build_export_index(results, store, devices)
+        new_paths = self.export_paths(selected, results, self.export_index)
+
+        touched = set()
+        for key, path in old_paths.items():
+            if new_paths.get(key) != path:
+                Path(base_path / path).unlink(missing_ok=True)
+                touched.add(path)
+
+        for exp in selected:
+            to_write = [
+                record
+                for record in results[exp.name]
+                if record["id"] in refetched[exp.name]
+                or old_paths.get((exp.name, record["id"]))
+                != new_paths[(exp.name, record["id"])]
+            ]
+            self._write_records(exp, to_write, self.export_index, base_path)
+            touched.update(new_paths[(exp.name, rec["id"])] for rec in to_write)
+
+        return touched
+
+    def reconcile_changes(self, selected, filters, results, store, base_path, position):
+        """Bring exported files up to date with changes made since position.
+
+        The changes to the exported object types, and to the related object
+        types in :data:`netboxgit.exporters.RELATED_CONTENT_TYPES`, are read from the NetBox change log and applied with
+        :meth:`apply_changes`. This repeats until the change log is quiet, up
+        to MAX_RECONCILE_ROUNDS times.
+
+        :param selected: The exporters that were run
+        :type selected: list
+        :param filters: The NetBox query filters the export used
+        :type filters: dict
+        :param results: Exported records by object type name, updated in place
+        :type results: dict
+        :param store: The store the records were compacted with
+        :type store: :class:`netboxgit.records.RecordStore`
+        :param base_path: The filesystem location for config data
+        :type base_path: `pathlib.Path`
+        :param position: Change log position from before the export
+        :type position: int
+        :return: The change log position the export is consistent with
+        :rtype: int
+        """
+        content_types = [exp.content_type for exp in selected]
+        content_types.extend(exporters.RELATED_CONTENT_TYPES)
+        for _ in range(MAX_RECONCILE_ROUNDS):
+            changes = self.get_changes_since(position, content_types)
+            if not changes:
+                return position
+
+            position = max(change.id for change in changes)
+            changed = defaultdict(set)
+            for change in changes:
+                changed[change.changed_object_type].add(change.changed_object_id)
+            logger.info(f"Re-exporting {len(changes)} objects changed during export")
+            self.apply_changes(selected, filters, results, store, base_path, changed)
+
+        logger.warning(
+            f"NetBox still changing after {MAX_RECONCILE_ROUNDS} re-exports, "
+            f"export is consistent up to change {position} only"
+        )
+        return position
+
+    def summarize_devices(self, records):
+        """Summarise the management device of exported records.
+
+        Uses the index from the last :meth:`export_objects` run.
+
+        :param records: Exported records that reference a device
+        :type records: list
+        :return: hostname and platform by device management name
+        :rtype: dict
+        """
+        index = self.export_index["devices"]
+        devices = {}
+        for record in records:
+            device = index[record["device"]["id"]]
+            vc = device.get("virtual_chassis")
+            if vc and vc.get("master"):
+                mgmt_device = index[vc["master"]["id"]]
+            else:
+                mgmt_device = device
+            devices[exporters.mgmt_name(device)] = {
+                "hostname": mgmt_device["primary_ip"]["address"],
+                "platform": mgmt_device["platform"]["slug"],
+            }
+        return devices
+
 
 def main():
     """"""
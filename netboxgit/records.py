@@ -0,0 +1,165 @@
+import logging
+from collections.abc import Mapping
+
+"""
+Compact in-memory representation of NetBox object records.
+
+Casting a pynetbox object to a dict gives a full nested dict per object,
+repeating the same nested device, VLAN, type etc. objects for every record
+that references them. A :class:`RecordStore` converts such dicts into
+:class:`CompactRecord` objects, the values held in a tuple with the key names
+shared between records of the same shape, and nested objects interned so
+each distinct one is stored once per store.
+
+A CompactRecord is a read only mapping so can be used in place of the dict,
+:meth:`CompactRecord.to_dict` gives back the original JSON layout.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class RecordLayout:
+    """The key names of a record shape and the position of each key."""
+
+    __slots__ = ("keys", "positions")
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.positions = {k: i for i, k in enumerate(keys)}
+
+
+class FrozenList(tuple):
+    """An interned list value, converts back to a list."""
+
+    __slots__ = ()
+
+
+class CompactRecord(Mapping):
+    """A read only mapping storing its values in a tuple.
+
+    :param layout: Key names shared by records of the same shape
+    :type layout: :class:`RecordLayout`
+    :param values: The values in the order of layout.keys
+    :type values: tuple
+    """
+
+    __slots__ = ("_layout", "_values")
+
+    def __init__(self, layout, values):
+        self._layout = layout
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self._layout.positions[key]]
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._layout.positions
+
+    def __repr__(self):
+        return f"<CompactRecord {self.get('id')} {self.get('name', '')}>"
+
+    def to_dict(self):
+        """Return the record as nested dicts and lists, as cast from NetBox."""
+        return {k: _thaw(v) for k, v in zip(self._layout.keys, self._values)}
+
+
+def _thaw(value):
+    if isinstance(value, CompactRecord):
+        return value.to_dict()
+    if isinstance(value, FrozenList):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def to_dict(record):
+    """Return a new dict for a record whether compact or a plain dict."""
+    if isinstance(record, CompactRecord):
+        return record.to_dict()
+    return dict(record)
+
+
+class RecordStore:
+    """Convert records to compact form, interning the repeated parts.
+
+    Nested objects, lists, strings and key layouts are pooled so every
+    record converted by the same store shares a single copy of each.
+    """
+
+    def __init__(self):
+        self._layouts = {}
+        self._pool = {}
+
+    def __len__(self):
+        """Number of distinct interned values."""
+        return len(self._pool)
+
+    def _layout(self, keys):
+        layout = self._layouts.get(keys)
+        if layout is None:
+            keys = tuple(self._intern_str(k) for k in keys)
+            layout = self._layouts.setdefault(keys, RecordLayout(keys))
+        return layout
+
+    def _intern_str(self, value):
+        return self._pool.setdefault(value, value)
+
+    def _intern(self, kind, value):
+        # Nested values are already interned so are keyed by identity. The
+        # value types form part of the key, True == 1 but must not be
+        # exchanged for one another.
+        pool_key = (kind,) + tuple(
+            (type(v), id(v) if isinstance(v, (CompactRecord, FrozenList)) else v)
+            for v in (value._values if kind is CompactRecord else value)
+        )
+        if kind is CompactRecord:
+            pool_key += (value._layout.keys,)
+        return self._pool.setdefault(pool_key, value)
+
+    def _freeze(self, value, unwanted_keys, unwanted_values):
+        if isinstance(value, Mapping):
+            record = self._compact(value, unwanted_keys, unwanted_values)
+            return self._intern(CompactRecord, record)
+        if isinstance(value, (list, FrozenList)):
+            frozen = FrozenList(self._freeze(v, (), ()) for v in value)
+            return self._intern(FrozenList, frozen)
+        if isinstance(value, str):
+            return self._intern_str(value)
+        return value
+
+    def _compact(self, record, unwanted_keys, unwanted_values):
+        items = [
+            (k, v)
+            for k, v in record.items()
+            if k not in unwanted_keys and v not in unwanted_values
+        ]
+        layout = self._layout(tuple(k for k, _ in items))
+        values = tuple(
+            self._freeze(v, unwanted_keys, unwanted_values) for _, v in items
+        )
+        return CompactRecord(layout, values)
+
+    def compact(self, record, unwanted_keys=(), unwanted_values=()):
+        """Convert a record dict to a :class:`CompactRecord`.
+
+        Items are cleaned as for the dict cleaning methods of
+        :class:`netboxgit.netboxdata.GDNetBoxer`, keys in unwanted_keys
+        are removed from nested dicts too and items with a value in
+        unwanted_values are removed.
+
+        :param record: The record, e.g. a pynetbox object cast to a dict, or
+            a compact record from another store
+        :type record: dict
+        :param unwanted_keys: Keys of items to remove
+        :type unwanted_keys: list
+        :param unwanted_values: Values of items to remove
+        :type unwanted_values: list
+        :return: The compact record
+        :rtype: :class:`CompactRecord`
+        """
+        return self._compact(record, unwanted_keys, unwanted_values)
@@ -0,0 +1,469 @@
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from netboxgit import exporters, gitstuff, records
+
+"""
+Near real time sync of NetBox into git driven by NetBox webhooks.
+
+NetBox is configured with a webhook, for object create/update/delete, that
+POSTs to the local listener of a :class:`SyncService`. Events are coalesced
+per object for a short debounce window, then only the changed objects are
+retrieved from NetBox, their JSON files rewritten or removed with the
+existing export logic, and the batch committed (and optionally pushed) with
+:mod:`netboxgit.gitstuff`. A full export is run at start up and then
+periodically to reconcile anything a webhook missed.
+"""
+
+logger = logging.getLogger(__name__)
+
+# The record store is rebuilt when a batch grows it to this many times its
+# size after the last rebuild, dropping superseded versions of changed objects
+STORE_GROWTH_LIMIT = 2
+
+# Seconds between attempts to push to remotes a push failed for
+PUSH_RETRY_INTERVAL = 30
+
+# Seconds between retries of a failed full export run because a sync failed or
+# a webhook was refused, NetBox does not resend webhooks
+RESYNC_INTERVAL = 30
+
+
+class ChangeBatcher:
+    """Coalesce changed objects into batches.
+
+    A batch is ready once no change has arrived for debounce seconds, or
+    max_delay seconds after its first change so a steady stream of changes
+    cannot hold it back forever. At most max_pending distinct objects are
+    held, further changes are refused until a batch is taken.
+
+    :param debounce: Quiet period in seconds that ends a batch
+    :type debounce: float
+    :param max_delay: Max seconds a change waits to be batched
+    :type max_delay: float
+    :param max_pending: Max distinct changed objects held
+    :type max_pending: int
+    """
+
+    def __init__(self, debounce=2.0, max_delay=10.0, max_pending=10000):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self._pending = set()
+        self._first = None
+        self._last = None
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def add(self, content_type, object_id, timeout=0):
+        """Add a changed object, waiting up to timeout seconds for space.
+
+        :return: `True` if the change was accepted, `False` if full
+        :rtype: bool
+        """
+        key = (content_type, object_id)
+        with self._cond:
+            if key not in self._pending and not self._cond.wait_for(
+                lambda: len(self._pending) < self.max_pending, timeout
+            ):
+                return False
+            now = time.monotonic()
+            if not self._pending:
+                self._first = now
+            self._last = now
+            self._pending.add(key)
+            self._cond.notify_all()
+        return True
+
+    def _wait_time(self):
+        """Seconds until the pending batch is ready, None if nothing pending."""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        return max(
+            0,
+            min(self._last + self.debounce, self._first + self.max_delay) - now,
+        )
+
+    def take(self, timeout=None):
+        """Wait up to timeout seconds for a batch to be ready and take it.
+
+        :return: Changed object ids by change log object type, empty if
+            no batch was ready in time
+        :rtype: dict
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                wait = self._wait_time()
+                if wait == 0:
+                    break
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return {}
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+            changed = defaultdict(set)
+            for content_type, object_id in self._pending:
+                changed[content_type].add(object_id)
+            self._pending.clear()
+            self._cond.notify_all()
+        return dict(changed)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accept NetBox webhook POSTs for the server's sync_service."""
+
+    def _reply(self, code):
+        self.send_response(code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        service = self.server.sync_service
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        if not service.verify_signature(body, self.headers.get("X-Hook-Signature")):
+            logger.warning(f"Webhook with bad signature from {self.client_address}")
+            return self._reply(403)
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return self._reply(400)
+
+        accepted = service.handle_event(event)
+        if accepted is None:
+            return self._reply(200)  # not an object type we export
+        return self._reply(202 if accepted else 503)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def webhook_signature(secret, body):
+    """Return the NetBox X-Hook-Signature value for a webhook body."""
+    return hmac.new(secret.encode("utf8"), body, hashlib.sha512).hexdigest()
+
+
+def send_webhook(url, model, object_id, event="updated", secret=None):
+    """POST a minimal NetBox style webhook, e.g. to test a SyncService.
+
+    :return: The HTTP status code
+    :rtype: int
+    """
+    body = json.dumps(
+        {"event": event, "model": model, "data": {"id": object_id}}
+    ).encode("utf8")
+    req = urllib.request.Request(
+        url, data=body, headers={"Content-Type": "application/json"}
+    )
+    if secret:
+        req.add_header("X-Hook-Signature", webhook_signature(secret, body))
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+class SyncService:
+    """Keep a git repo in sync with NetBox from webhook events.
+
+    :param nbx: Connection to NetBox
+    :type nbx: :class:`netboxgit.netboxdata.GDNetBoxer`
+    :param repo: The repo to commit to, on the branch to update
+    :type repo: :class:`git.cmd.Git`
+    :param base_path: The filesystem location for config data in the repo
+    :type base_path: `pathlib.Path`
+    :param object_types: Registered exporter names, default all
+    :type object_types: list
+    :param filters: NetBox query filters e.g. {"tag": "x"}
+    :type filters: dict
+    :param branch: Branch to push after each commit, `None` to not push
+    :type branch: str
+    :param remotes: The names of the git remotes to push to
+    :type remotes: list
+    :param host: Address for the webhook listener
+    :type host: str
+    :param port: Port for the webhook listener, 0 for any free port
+    :type port: int
+    :param secret: NetBox webhook secret, `None` to not check signatures
+    :type secret: str
+    :param debounce: See :class:`ChangeBatcher`
+    :param max_delay: See :class:`ChangeBatcher`
+    :param max_pending: See :class:`ChangeBatcher`
+    :param full_timeout: Seconds a webhook waits for space in a full batch
+        before being refused with HTTP 503
+    :type full_timeout: float
+    :param reconcile_interval: Seconds between full exports, `None` for
+        only at start up. A full export also runs as soon as possible after
+        a sync fails or a webhook is refused.
+    :type reconcile_interval: float
+    """
+
+    def __init__(
+        self,
+        nbx,
+        repo,
+        base_path,
+        object_types=None,
+        filters=None,
+        branch=None,
+        remotes=("origin",),
+        host="127.0.0.1",
+        port=8080,
+        secret=None,
+        debounce=2.0,
+        max_delay=10.0,
+        max_pending=10000,
+        full_timeout=5.0,
+        reconcile_interval=86400,
+    ):
+        self.nbx = nbx
+        self.repo = repo
+        self.base_path = Path(base_path)
+        if object_types is None:
+            object_types = list(exporters.EXPORTERS)
+        self.selected = [exporters.get_exporter(name) for name in object_types]
+        self.filters = dict(filters or {})
+        self.branch = branch
+        self.remotes = list(remotes)
+        self.secret = secret
+        self.full_timeout = full_timeout
+        self.reconcile_interval = reconcile_interval
+
+        # NetBox webhooks name the model only, e.g. "interface"
+        content_types = [exp.content_type for exp in self.selected]
+        content_types.extend(exporters.RELATED_CONTENT_TYPES)
+        self.models = {ct.split(".")[1]: ct for ct in content_types}
+
+        self.batcher = ChangeBatcher(debounce, max_delay, max_pending)
+        self.server = ThreadingHTTPServer((host, port), WebhookHandler)
+        self.server.sync_service = self
+        self.results = None
+        self.store = None
+        self.store_limit = None
+        self.last_reconcile = None
+        self.last_reconcile_attempt = None
+        # Set when changes may have been missed, a full export catches up
+        self.resync = False
+        # Remotes the branch is not yet pushed to, tried until they succeed
+        self.unpushed = set(self.remotes) if branch else set()
+        self.last_push = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def url(self):
+        """The URL to configure as the NetBox webhook target."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def verify_signature(self, body, signature):
+        """Return True if the webhook body is signed with the secret."""
+        if self.secret is None:
+            return True
+        if not signature:
+            return False
+        return hmac.compare_digest(webhook_signature(self.secret, body), signature)
+
+    def handle_event(self, event):
+        """Queue the object changed by a webhook event.
+
+        :return: `True` if queued, `False` if refused as the batch is full,
+            `None` if the object type is not one being synced
+        """
+        content_type = self.models.get(event.get("model"))
+        if content_type is None:
+            return None
+        try:
+            object_id = event["data"]["id"]
+        except (KeyError, TypeError):
+            logger.warning(f"Webhook event without an object id: {event}")
+            return None
+
+        logger.debug(f"Webhook {event.get('event')} {content_type} {object_id}")
+        accepted = self.batcher.add(content_type, object_id, timeout=self.full_timeout)
+        if not accepted:
+            logger.warning(f"Refused {content_type} {object_id}, batch is full")
+            self.resync = True
+        return accepted
+
+    def commit(self, message):
+        """Commit all changes to the repo and push them if a branch is set.
+
+        :return: `True` if there was a commit, `False` otherwise
+        :rtype: bool
+        """
+        if not gitstuff.commit_all(self.repo, message):
+            logger.debug("git repo detected no changes")
+            return False
+        logger.info(f"Committed: {message}")
+        if self.branch:
+            self.unpushed.update(self.remotes)
+            self.push()
+        return True
+
+    def push(self):
+        """Push the branch to the remotes it is not yet pushed to.
+
+        :return: `True` if the branch is pushed to every remote
+        :rtype: bool
+        """
+        self.last_push = time.monotonic()
+        if self.unpushed:
+            results = gitstuff.push_refs(
+                self.repo, [self.branch], sorted(self.unpushed)
+            )
+            self.unpushed = {name for name, res in results.items() if not res.ok}
+        if self.unpushed:
+            logger.warning(
+                f"Push to {sorted(self.unpushed)} failed, "
+                f"retrying in {PUSH_RETRY_INTERVAL}s"
+            )
+        return not self.unpushed
+
+    def reconcile(self):
+        """Run a full export, removing files of objects no longer exported.
+
+        Files already in the repo are compared with the export, so objects
+        deleted or no longer matching the filters while the service was not
+        running are removed too.
+        """
+        attempt = self.last_reconcile_attempt = time.monotonic()
+        # Changes missed until now are caught up by this export
+        self.resync = False
+        old_paths = self.nbx.existing_paths(self.selected, self.base_path)
+
+        self.store = records.RecordStore()
+        self.results = self.nbx.export_objects(
+            self.base_path,
+            object_types=[exp.name for exp in self.selected],
+            store=self.store,
+            **self.filters,
+        )
+        self.store_limit = STORE_GROWTH_LIMIT * len(self.store)
+        new_paths = set(
+            self.nbx.export_paths(
+                self.selected, self.results, self.nbx.export_index
+            ).values()
+        )
+        for path in old_paths - new_paths:
+            Path(self.base_path / path).unlink(missing_ok=True)
+
+        self.commit("Reconcile full export from NetBox")
+        self.last_reconcile = attempt
+
+    def sync(self, changed):
+        """Apply a batch of changed objects and commit the result."""
+        touched = self.nbx.apply_changes(
+            self.selected,
+            self.filters,
+            self.results,
+            self.store,
+            self.base_path,
+            changed,
+        )
+        count = sum(len(ids) for ids in changed.values())
+        logger.info(f"Synced {count} changed NetBox objects, {len(touched)} files")
+        if len(self.store) > self.store_limit:
+            self.rebuild_store()
+        self.commit(f"Sync {count} changed NetBox objects")
+
+    def rebuild_store(self):
+        """Move the exported records into a new store.
+
+        The store keeps every version of the changed objects it has interned,
+        only those still referenced are moved to the new store.
+        """
+        store = records.RecordStore()
+        for name, exported in self.results.items():
+            self.results[name] = [store.compact(record) for record in exported]
+        index = self.nbx.export_index
+        index["devices"] = {
+            dev_id: store.compact(dev) for dev_id, dev in index["devices"].items()
+        }
+        logger.debug(f"Record store rebuilt, {len(self.store)} to {len(store)}")
+        self.store = store
+        self.store_limit = STORE_GROWTH_LIMIT * len(store)
+
+    def _reconcile_due(self):
+        if self.resync:
+            # Straight away, unless the last full export failed too
+            if self.last_reconcile == self.last_reconcile_attempt:
+                return True
+            elapsed = time.monotonic() - self.last_reconcile_attempt
+            return elapsed >= RESYNC_INTERVAL
+        if self.reconcile_interval is None:
+            return False
+        return time.monotonic() - self.last_reconcile >= self.reconcile_interval
+
+    def _push_due(self):
+        if not self.unpushed:
+            return False
+        if self.last_push is None:
+            return True
+        return time.monotonic() - self.last_push >= PUSH_RETRY_INTERVAL
+
+    def _run_sync(self):
+        """Apply batches as they become ready, and reconcile when due."""
+        while not self._stop.is_set():
+            changed = self.batcher.take(timeout=0.5)
+            try:
+                if changed:
+                    self.sync(changed)
+                if self._reconcile_due():
+                    self.reconcile()
+                if self._push_due():
+                    self.push()
+            except Exception as exc:
+                # Keep serving, a full export catches up on the failed batch
+                logger.exception(exc)
+                logger.warning("Sync failed, a full export will catch up")
+                self.resync = True
+
+    def start(self):
+        """Reconcile, then listen for webhooks and sync in the background."""
+        self.reconcile()
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run_sync, daemon=True),
+            threading.Thread(target=self.server.serve_forever, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Listening for NetBox webhooks on {self.url}")
+
+    def stop(self):
+        """Stop listening and syncing, any batch in progress is finished."""
+        self.server.shutdown()
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self.server.server_close()
+
+    def serve_forever(self):
+        """Run the service until interrupted."""
+        self.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info("Stopping")
+        finally:
+            self.stop()
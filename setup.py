@@ -31,6 +31,7 @@ def main():
         license="MIT",
         packages=["netboxgit"],
         install_requires=setup_reqs,
+        entry_points={"console_scripts": ["netboxgit=netboxgit.cli:main"]},
         zip_safe=False,
     )
 
@@ -1,8 +1,11 @@
 import os
+from types import SimpleNamespace
 
 import pytest
 from git import Repo
 
+from .context import netboxdata
+
 
 @pytest.fixture
 def repo_path(tmp_path_factory):
@@ -15,6 +18,176 @@ def repo_path(tmp_path_factory):
     return str(r_path)
 
 
+@pytest.fixture
+def git_identity(monkeypatch):
+    """Git author and committer for tests that commit."""
+    for var in ("GIT_AUTHOR", "GIT_COMMITTER"):
+        monkeypatch.setenv(f"{var}_NAME", "test")
+        monkeypatch.setenv(f"{var}_EMAIL", "test@example.com")
+
+
+class FakeRecord(dict):
+    """Stand in for a pynetbox record, casts to a dict like the real one."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeEndpoint:
+    """Stand in for a pynetbox endpoint over a list of record dicts."""
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = []
+
+    def filter(self, **kwargs):
+        self.calls.append(kwargs)
+        found = self.records
+        if "id" in kwargs:
+            found = [r for r in found if r["id"] in kwargs["id"]]
+        if "id__gt" in kwargs:
+            found = [r for r in found if r["id"] > kwargs["id__gt"]]
+        if "tag" in kwargs:
+            found = [r for r in found if kwargs["tag"] in r.get("tags", [])]
+        if "changed_object_type_id" in kwargs:
+            found = [
+                r
+                for r in found
+                if r["changed_object_type_id"] in kwargs["changed_object_type_id"]
+            ]
+        if "ordering" in kwargs:
+            found = sorted(
+                found, key=lambda r: r["id"], reverse=kwargs["ordering"] == "-id"
+            )
+        if "limit" in kwargs:
+            found = found[: kwargs["limit"]]
+        return [FakeRecord(r) for r in found]
+
+    def all(self):
+        return self.filter()
+
+
+CONTENT_TYPES = [
+    "circuits.circuit",
+    "circuits.provider",
+    "dcim.cable",
+    "dcim.device",
+    "dcim.interface",
+    "dcim.site",
+    "dcim.virtualchassis",
+    "ipam.ipaddress",
+    "ipam.prefix",
+    "ipam.vlan",
+    "ipam.vrf",
+]
+
+
+def change(change_id, content_type, object_id):
+    """A fake NetBox object change log entry."""
+    return {
+        "id": change_id,
+        "changed_object_type": content_type,
+        "changed_object_type_id": CONTENT_TYPES.index(content_type) + 1,
+        "changed_object_id": object_id,
+    }
+
+
+def _ref(record, *keys):
+    return {k: record[k] for k in ("id", "url") + keys}
+
+
+@pytest.fixture
+def fake_nb():
+    """A fake pynetbox API holding a small tagged site.
+
+    sw2 is a virtual chassis member, neither it nor its master sw3 are tagged
+    so they are only reachable through the tagged interface on sw2.
+    """
+    sw1 = {"id": 1, "url": "u/1", "name": "sw1", "tags": ["t"], "virtual_chassis": None}
+    sw1["primary_ip"] = {"address": "10.0.0.1/32"}
+    sw1["platform"] = {"slug": "junos"}
+    sw3 = {"id": 3, "url": "u/3", "name": "sw3", "virtual_chassis": None}
+    sw3["primary_ip"] = {"address": "10.0.0.3/32"}
+    sw3["platform"] = {"slug": "eos"}
+    stack = {"id": 9, "name": "stack1", "master": _ref(sw3, "name")}
+    sw2 = {"id": 2, "url": "u/2", "name": "sw2", "virtual_chassis": stack}
+    sw3["virtual_chassis"] = stack
+    vrf = {"id": 5, "name": "blue"}
+    site = {"id": 7, "name": "dc1"}
+
+    return SimpleNamespace(
+        dcim=SimpleNamespace(
+            devices=FakeEndpoint([sw1, sw2, sw3]),
+            interfaces=FakeEndpoint(
+                [
+                    {
+                        "id": 11,
+                        "name": "ge-0/0/1",
+                        "tags": ["t"],
+                        "device": _ref(sw1, "name"),
+                    },
+                    {
+                        "id": 12,
+                        "name": "xe-1/0/0",
+                        "tags": ["t"],
+                        "device": _ref(sw2, "name"),
+                    },
+                    {
+                        "id": 13,
+                        "name": "xe-1/0/1",
+                        "tags": [],
+                        "device": _ref(sw2, "name"),
+                    },
+                ]
+            ),
+            cables=FakeEndpoint([{"id": 31, "url": "u/31", "tags": ["t"]}]),
+        ),
+        ipam=SimpleNamespace(
+            ip_addresses=FakeEndpoint(
+                [{"id": 41, "address": "10.1.0.1/24", "vrf": None, "tags": ["t"]}]
+            ),
+            vlans=FakeEndpoint(
+                [{"id": 51, "vid": 100, "name": "users", "site": site, "tags": ["t"]}]
+            ),
+            prefixes=FakeEndpoint(
+                [{"id": 61, "prefix": "10.1.0.0/24", "vrf": vrf, "tags": ["t"]}]
+            ),
+        ),
+        extras=SimpleNamespace(
+            content_types=FakeEndpoint(
+                [
+                    {"id": i, "app_label": ct.split(".")[0], "model": ct.split(".")[1]}
+                    for i, ct in enumerate(CONTENT_TYPES, start=1)
+                ]
+            ),
+            object_changes=FakeEndpoint([change(900, "dcim.site", 7)]),
+        ),
+        circuits=SimpleNamespace(
+            circuits=FakeEndpoint(
+                [
+                    {
+                        "id": 71,
+                        "cid": "C-1",
+                        "provider": {"id": 81, "name": "acme"},
+                        "tags": ["t"],
+                    }
+                ]
+            ),
+        ),
+    )
+
+
+@pytest.fixture
+def nbx(fake_nb):
+    """A GDNetBoxer talking to the fake NetBox API."""
+    boxer = netboxdata.GDNetBoxer(url="http://netbox.invalid", token="x")
+    boxer.nb = fake_nb
+    return boxer
+
+
 # @pytest.fixture
 # def repo(tmp_path_factory):
 #    """ Create a git repo to test on. tmp_path is managed by pytest.
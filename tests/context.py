@@ -3,4 +3,4 @@ import sys
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from netboxgit import gitstuff
+from netboxgit import cli, exporters, gitstuff, netboxdata, records, syncservice
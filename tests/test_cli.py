@@ -0,0 +1,102 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import git
+import pytest
+
+from .context import cli
+
+
+def test_cli_import_is_lazy():
+    """Importing the command line must not load the heavy libraries."""
+    code = (
+        "import sys, netboxgit.cli; "
+        "print([m for m in ('git', 'pynetbox', 'requests') if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(cli.__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_cli_requires_command():
+    with pytest.raises(SystemExit):
+        cli.main([])
+
+
+def test_cli_status(repo_path, capsys):
+    assert cli.main(["status", "--repo", repo_path]) == 0
+    assert "Git clean:     True" in capsys.readouterr().out
+
+
+def test_cli_export_requires_filter(repo_path, monkeypatch):
+    monkeypatch.delenv("NETBOX_TAG", raising=False)
+    with pytest.raises(SystemExit):
+        cli.main(
+            ["export", "--netbox-url", "http://x", "--netbox-token", "t"]
+            + ["--repo", repo_path]
+        )
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--site", "dc1", "--branch-from", "master"],
+        ["--site", "dc1", "--branch", "b"],
+        ["--site", "dc1", "--no-commit", "--push", "origin"],
+    ],
+)
+def test_cli_export_checks_branch_first(tmp_path, monkeypatch, options):
+    monkeypatch.delenv("NETBOX_TAG", raising=False)
+    monkeypatch.delenv("GIT_BRANCH_MAIN", raising=False)
+    repo_path = tmp_path / "clone"
+    args = ["export", "--netbox-url", "http://x", "--netbox-token", "t"]
+    args += ["--repo", str(repo_path), "--remote-url", str(tmp_path / "none")]
+
+    with pytest.raises(SystemExit):
+        cli.main(args + options)
+    assert not repo_path.exists()
+
+
+def test_cli_restore_dry_run(tmp_path, capsys):
+    intf = {"name": "ge-0/0/1", "type": {"id": 1000}, "device": {"name": "sw1"}}
+    (tmp_path / "ge-0-0-1.json").write_text(json.dumps(intf))
+
+    args = ["restore", "--netbox-url", "http://x", "--netbox-token", "t"]
+    assert cli.main(args + ["--dry-run", str(tmp_path)]) == 0
+    assert capsys.readouterr().out == "sw1 ge-0/0/1\n"
+
+
+def test_cli_export_twice(nbx, tmp_path, git_identity, monkeypatch):
+    """A second export reuses the clone left on the tag branch."""
+    upstream = git.Repo.init(path=str(tmp_path / "upstream"))
+    (tmp_path / "upstream" / "README").write_text("data\n")
+    upstream.git.add("README")
+    upstream.git.commit("-m", "first")
+    upstream.git.branch("-M", "master")
+    monkeypatch.setattr(cli, "_netboxer", lambda args: nbx)
+
+    repo_path = tmp_path / "clone"
+    args = ["export", "--netbox-url", "http://x", "--netbox-token", "t"]
+    args += ["--tag", "t", "--repo", str(repo_path), "--branch-from", "master"]
+    args += ["--remote-url", str(tmp_path / "upstream")]
+    assert cli.main(args) == 0
+    assert (repo_path / "data" / "devices" / "sw1" / "sw1.json").exists()
+
+    # Still on the tag branch from the first run
+    assert cli.main(args) == 0
+
+    (tmp_path / "upstream" / "NEWS").write_text("news\n")
+    upstream.git.add("NEWS")
+    upstream.git.commit("-m", "second")
+    clone = git.Repo(str(repo_path))
+    clone.git.checkout("master")
+    assert cli.main(args) == 0
+    assert clone.active_branch.name == "t"
+    assert clone.git.rev_parse("master") == upstream.head.commit.hexsha
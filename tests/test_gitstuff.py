@@ -1,3 +1,4 @@
+import git
 import pytest
 
 from .context import gitstuff
@@ -20,3 +21,70 @@ def test_load_repo(repo_path):
 # 
 #     assert not r.is_dirty()
 #     assert len(r.untracked_files) == 0
+
+
+@pytest.fixture
+def pushed_repo(tmp_path, git_identity):
+    """A repo with a commit on branches master and error-1 and two remotes."""
+    repo = git.Git(str(tmp_path / "work"))
+    git.Repo.init(path=str(tmp_path / "work"), initial_branch="master")
+    for name in ("one", "two"):
+        git.Repo.init(path=str(tmp_path / name), bare=True)
+        repo.remote("add", name, str(tmp_path / name))
+    (tmp_path / "work" / "f").write_text("1")
+    gitstuff.commit_all(repo, "first")
+    repo.branch("error-1")
+    return repo
+
+
+def test_parse_push_porcelain():
+    out = "\n".join(
+        [
+            "To /tmp/remote",
+            "*\trefs/heads/error-1:refs/heads/error-1\t[new branch]",
+            "!\trefs/heads/master:refs/heads/master\t[rejected] (fetch first)",
+            "Done",
+        ]
+    )
+    new, rejected = gitstuff.parse_push_porcelain(out)
+
+    assert new.ok and new.status == "new ref" and new.dst == "refs/heads/error-1"
+    assert not rejected.ok
+    assert rejected.summary == "[rejected]" and rejected.reason == "fetch first"
+
+
+def test_push_refs_to_many_remotes(pushed_repo):
+    results = gitstuff.push_refs(pushed_repo, ["master", "error-1"], ["one", "two"])
+
+    assert sorted(results) == ["one", "two"]
+    for result in results.values():
+        assert result.ok
+        assert [r.flag for r in result.refs] == ["*", "*"]
+
+    # A branch named after an error is not a failure
+    gitstuff.push_branch(pushed_repo, "error-1", "one")
+
+
+def test_push_refs_single_names(pushed_repo):
+    results = gitstuff.push_refs(pushed_repo, "master", "one")
+
+    assert list(results) == ["one"]
+    assert results["one"].ok
+
+
+def test_push_refs_rejected_atomic(pushed_repo, tmp_path):
+    gitstuff.push_refs(pushed_repo, ["master"], ["one"])
+    pushed_repo.commit("--amend", "-m", "rewritten")
+    pushed_repo.commit("--allow-empty", "-m", "second")
+
+    result = gitstuff.push_refs(
+        pushed_repo, ["master", "error-1"], ["one"], atomic=True
+    )["one"]
+
+    assert not result.ok
+    assert {r.dst: r.ok for r in result.refs} == {
+        "refs/heads/master": False,
+        "refs/heads/error-1": False,
+    }
+    with pytest.raises(RuntimeError):
+        gitstuff.push_branch(pushed_repo, "master", "one")
@@ -0,0 +1,193 @@
+import json
+
+import pytest
+
+from .conftest import CONTENT_TYPES, change
+from .context import exporters
+
+
+def test_exporter_file_path_replaces_path_separator(nbx):
+    exp = exporters.get_exporter("ip_addresses")
+    record = {"id": 41, "address": "10.1.0.1/24", "vrf": None}
+    assert exp.file_path(record, {}) == "ip-addresses/global/10.1.0.1-24_41.json"
+
+
+def test_get_exporter_unknown_name():
+    with pytest.raises(ValueError):
+        exporters.get_exporter("no_such_type")
+
+
+def test_export_objects_requires_filter(nbx, tmp_path):
+    with pytest.raises(ValueError):
+        nbx.export_objects(tmp_path)
+
+
+def test_export_objects_requires_object_types(nbx, tmp_path):
+    with pytest.raises(ValueError):
+        nbx.export_objects(tmp_path, object_types=[], tag="t")
+
+
+def test_export_objects_writes_all_types(nbx, fake_nb, tmp_path):
+    results = nbx.export_objects(tmp_path, tag="t")
+
+    assert {name: len(recs) for name, recs in results.items()} == {
+        "devices": 1,
+        "interfaces": 2,
+        "ip_addresses": 1,
+        "vlans": 1,
+        "prefixes": 1,
+        "cables": 1,
+        "circuits": 1,
+    }
+    written = sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*.json"))
+    assert written == [
+        "cables/31.json",
+        "circuits/acme/C-1.json",
+        "devices/stack1/interfaces/xe-1-0-0.json",
+        "devices/sw1/interfaces/ge-0-0-1.json",
+        "devices/sw1/sw1.json",
+        "ip-addresses/global/10.1.0.1-24_41.json",
+        "prefixes/blue/10.1.0.0-24_61.json",
+        "vlans/dc1/100-users_51.json",
+    ]
+
+    # Interfaces keep the full record, other types drop NetBox only keys
+    intf = json.loads((tmp_path / "devices/sw1/interfaces/ge-0-0-1.json").read_text())
+    assert intf["device"]["url"] == "u/1"
+    device = json.loads((tmp_path / "devices/sw1/sw1.json").read_text())
+    assert "url" not in device
+
+    # Related devices come from two bulk lookups, not one per interface
+    id_calls = [c for c in fake_nb.dcim.devices.calls if "id" in c]
+    assert id_calls == [{"id": [2]}, {"id": [3]}]
+
+
+def test_export_objects_duplicate_addresses(nbx, fake_nb, tmp_path, monkeypatch):
+    """Duplicate addresses get a file each, deleting one keeps the other."""
+    ips = fake_nb.ipam.ip_addresses.records
+    ips.append(dict(ips[0], id=42))
+    build_export_index = nbx._build_export_index
+
+    def delete_duplicate_mid_export(*args, **kwargs):
+        if ips[-1]["id"] == 42:
+            del ips[-1]
+            fake_nb.extras.object_changes.records.append(
+                change(901, "ipam.ipaddress", 42)
+            )
+        return build_export_index(*args, **kwargs)
+
+    monkeypatch.setattr(nbx, "_build_export_index", delete_duplicate_mid_export)
+    results = nbx.export_objects(tmp_path, object_types=["ip_addresses"], tag="t")
+
+    assert [r["id"] for r in results["ip_addresses"]] == [41]
+    written = sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*.json"))
+    assert written == ["ip-addresses/global/10.1.0.1-24_41.json"]
+
+
+def test_export_objects_rejects_path_collision(nbx, fake_nb, tmp_path):
+    devices = fake_nb.dcim.devices.records
+    devices.append(dict(devices[0], id=4))
+
+    with pytest.raises(ValueError):
+        nbx.export_objects(tmp_path, object_types=["devices"], tag="t")
+    assert list(tmp_path.rglob("*.json")) == []
+
+
+def test_summarize_devices_uses_virtual_chassis_master(nbx, tmp_path):
+    results = nbx.export_objects(tmp_path, object_types=["interfaces"], tag="t")
+
+    assert nbx.summarize_devices(results["interfaces"]) == {
+        "sw1": {"hostname": "10.0.0.1/32", "platform": "junos"},
+        "stack1": {"hostname": "10.0.0.3/32", "platform": "eos"},
+    }
+
+
+def test_adapt_interfaces_for_netbox(nbx):
+    intf = {
+        "name": "ge-0/0/1",
+        "url": "u/11",
+        "display_name": "ge-0/0/1",
+        "type": {"value": "1000base-t", "id": 1000},
+        "device": {"id": 1, "url": "u/1", "name": "sw1"},
+    }
+    adapted = nbx.adapt_interfaces_for_netbox({"sw1": {"ge-0/0/1": intf}})
+
+    assert adapted["sw1"]["ge-0/0/1"].to_dict() == {
+        "name": "ge-0/0/1",
+        "type": 1000,
+        "device": {"id": 1, "name": "sw1"},
+    }
+
+
+def test_export_objects_reconciles_changes_made_during_export(
+    nbx, fake_nb, tmp_path, monkeypatch
+):
+    build_export_index = nbx._build_export_index
+
+    def edit_netbox_mid_export(*args, **kwargs):
+        """Operators edit NetBox after the objects were first retrieved."""
+        if not fake_nb.extras.object_changes.records[-1]["id"] > 900:
+            intfs = fake_nb.dcim.interfaces.records
+            intfs[0]["name"] = "ge-0/0/9"  # renamed
+            del intfs[1]  # deleted
+            intfs[1]["tags"] = ["t"]  # newly tagged
+            fake_nb.extras.object_changes.records.extend(
+                change(i, "dcim.interface", o)
+                for i, o in ((901, 11), (902, 12), (903, 13))
+            )
+            # Not an exported object type so not read from the change log
+            fake_nb.extras.object_changes.records.append(change(904, "ipam.vlan", 51))
+        return build_export_index(*args, **kwargs)
+
+    monkeypatch.setattr(nbx, "_build_export_index", edit_netbox_mid_export)
+    results = nbx.export_objects(tmp_path, object_types=["interfaces"], tag="t")
+
+    assert sorted(r["name"] for r in results["interfaces"]) == ["ge-0/0/9", "xe-1/0/1"]
+    written = sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*.json"))
+    assert written == [
+        "devices/stack1/interfaces/xe-1-0-1.json",
+        "devices/sw1/interfaces/ge-0-0-9.json",
+    ]
+    assert nbx.changelog_position == 903
+    content_type_ids = {
+        CONTENT_TYPES.index(ct) + 1
+        for ct in ("dcim.interface",) + exporters.RELATED_CONTENT_TYPES
+    }
+    for call in fake_nb.extras.object_changes.calls[1:]:
+        assert set(call["changed_object_type_id"]) == content_type_ids
+
+
+def test_export_objects_inconsistent(nbx, fake_nb, tmp_path):
+    nbx.export_objects(tmp_path, object_types=["cables"], consistent=False, tag="t")
+
+    assert fake_nb.extras.object_changes.calls == []
+
+
+def test_export_objects_reconciles_renamed_vrf(nbx, fake_nb, tmp_path, monkeypatch):
+    build_export_index = nbx._build_export_index
+
+    def rename_vrf_mid_export(*args, **kwargs):
+        prefix = fake_nb.ipam.prefixes.records[0]
+        if prefix["vrf"]["name"] == "blue":
+            prefix["vrf"] = {"id": 5, "name": "green"}
+            fake_nb.extras.object_changes.records.append(change(901, "ipam.vrf", 5))
+        return build_export_index(*args, **kwargs)
+
+    monkeypatch.setattr(nbx, "_build_export_index", rename_vrf_mid_export)
+    nbx.export_objects(tmp_path, object_types=["prefixes"], tag="t")
+
+    written = sorted(str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*.json"))
+    assert written == ["prefixes/green/10.1.0.0-24_61.json"]
+    assert nbx.changelog_position == 901
+
+
+def test_export_objects_without_content_types(nbx, fake_nb, tmp_path):
+    nbx.export_objects(tmp_path, object_types=["cables"], tag="t")
+    assert nbx.changelog_position == 900
+
+    del fake_nb.extras.content_types
+    nbx.content_type_ids.clear()
+    results = nbx.export_objects(tmp_path, object_types=["cables"], tag="t")
+
+    assert len(results["cables"]) == 1
+    assert nbx.changelog_position is None
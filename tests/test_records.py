@@ -0,0 +1,69 @@
+import json
+
+from .context import records
+
+
+def _intf(intf_id, name):
+    return {
+        "id": intf_id,
+        "name": name,
+        "url": f"u/{intf_id}",
+        "enabled": True,
+        "mtu": 1,
+        "device": {"id": 1, "url": "u/1", "name": "sw1"},
+        "type": {"value": "1000base-t", "label": "1000BASE-T", "id": 1000},
+        "tagged_vlans": [{"id": 5, "vid": 100, "name": "users"}],
+        "description": "",
+    }
+
+
+def test_compact_converts_back_to_json_layout():
+    store = records.RecordStore()
+    intf = store.compact(_intf(11, "ge-0/0/1"))
+
+    assert intf.to_dict() == _intf(11, "ge-0/0/1")
+    assert json.dumps(intf.to_dict(), sort_keys=True) == json.dumps(
+        _intf(11, "ge-0/0/1"), sort_keys=True
+    )
+    assert intf["device"]["name"] == "sw1"
+    assert dict(intf)["mtu"] == 1
+
+
+def test_compact_shares_repeated_nested_objects():
+    store = records.RecordStore()
+    first = store.compact(_intf(11, "ge-0/0/1"))
+    second = store.compact(_intf(12, "ge-0/0/2"))
+
+    assert first["device"] is second["device"]
+    assert first["type"] is second["type"]
+    assert first["tagged_vlans"] is second["tagged_vlans"]
+    assert first._layout is second._layout
+
+
+def test_compact_keeps_bool_and_int_apart():
+    store = records.RecordStore()
+    enabled = store.compact({"ref": {"x": True}})
+    one = store.compact({"ref": {"x": 1}})
+
+    assert enabled["ref"]["x"] is True
+    assert one["ref"]["x"] is not True
+
+
+def test_compact_removes_unwanted_items():
+    store = records.RecordStore()
+    intf = store.compact(_intf(11, "ge-0/0/1"), ["url"], [""])
+
+    assert "url" not in intf
+    assert "url" not in intf["device"]
+    assert "description" not in intf
+
+
+def test_compact_into_new_store():
+    old = records.RecordStore().compact(_intf(11, "ge-0/0/1"))
+    store = records.RecordStore()
+    intf = store.compact(old)
+
+    assert intf.to_dict() == _intf(11, "ge-0/0/1")
+    assert intf["device"] is not old["device"]
+    assert intf["tagged_vlans"] is not old["tagged_vlans"]
+    assert intf["device"] is store.compact(_intf(12, "ge-0/0/2"))["device"]
@@ -0,0 +1,156 @@
+import time
+from pathlib import Path
+
+import git
+import pytest
+
+from .context import gitstuff, syncservice
+
+
+def _service(nbx, repo_path):
+    return syncservice.SyncService(
+        nbx,
+        gitstuff.load_repo(repo_path),
+        Path(repo_path) / "data",
+        object_types=["interfaces"],
+        filters={"tag": "t"},
+        port=0,
+        secret="s3cret",
+        debounce=0.05,
+        reconcile_interval=None,
+    )
+
+
+@pytest.fixture
+def service(nbx, repo_path, git_identity):
+    svc = _service(nbx, repo_path)
+    svc.start()
+    yield svc
+    svc.stop()
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_batcher_coalesces_changes():
+    batcher = syncservice.ChangeBatcher(debounce=0.05, max_pending=2)
+
+    assert batcher.add("dcim.interface", 11)
+    assert batcher.add("dcim.interface", 11)
+    assert batcher.add("dcim.device", 1)
+    assert not batcher.add("dcim.interface", 12)  # full
+    assert batcher.take(timeout=1) == {"dcim.interface": {11}, "dcim.device": {1}}
+    assert batcher.take(timeout=0.1) == {}
+
+
+def test_webhook_syncs_and_commits(service, fake_nb, repo_path):
+    repo = service.repo
+    data = Path(repo_path) / "data" / "devices"
+    assert (data / "sw1/interfaces/ge-0-0-1.json").exists()
+    assert repo.rev_list("--count", "HEAD") == "1"
+
+    fake_nb.dcim.interfaces.records[0]["name"] = "ge-0/0/9"
+    fake_nb.dcim.interfaces.records[2]["tags"] = ["t"]
+    for object_id in (11, 11, 13):
+        status = syncservice.send_webhook(
+            service.url, "interface", object_id, secret="s3cret"
+        )
+        assert status == 202
+
+    _wait_for(lambda: repo.rev_list("--count", "HEAD") == "2")
+    assert not (data / "sw1/interfaces/ge-0-0-1.json").exists()
+    assert (data / "sw1/interfaces/ge-0-0-9.json").exists()
+    assert (data / "stack1/interfaces/xe-1-0-1.json").exists()
+    assert gitstuff.isclean(repo)
+
+    # Webhook records are interned with the exported ones
+    intfs = {r["id"]: r for r in service.results["interfaces"]}
+    assert intfs[12]["device"] is intfs[13]["device"]
+
+    before = {i: r.to_dict() for i, r in intfs.items()}
+    old_store = service.store
+    service.rebuild_store()
+    intfs = {r["id"]: r for r in service.results["interfaces"]}
+    assert service.store is not old_store
+    assert {i: r.to_dict() for i, r in intfs.items()} == before
+    assert intfs[12]["device"] is intfs[13]["device"]
+
+
+def test_first_reconcile_removes_stale_files(nbx, repo_path, git_identity):
+    data = Path(repo_path) / "data"
+    stale = data / "devices/sw9/interfaces/ge-0-0-5.json"
+    stale.parent.mkdir(parents=True)
+    stale.write_text("{}")
+    (data / "devices.json").write_text("{}")  # not an interface file
+
+    svc = _service(nbx, repo_path)
+    svc.start()
+    svc.stop()
+
+    assert not stale.exists()
+    assert (data / "devices.json").exists()
+    assert (data / "devices/sw1/interfaces/ge-0-0-1.json").exists()
+
+
+def test_failed_sync_runs_full_export(service, fake_nb, repo_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("NetBox timed out")
+
+    monkeypatch.setattr(service.nbx, "apply_changes", fail)
+    fake_nb.dcim.interfaces.records[0]["name"] = "ge-0/0/9"
+    assert (
+        syncservice.send_webhook(service.url, "interface", 11, secret="s3cret") == 202
+    )
+
+    _wait_for(lambda: service.repo.rev_list("--count", "HEAD") == "2")
+    data = Path(repo_path) / "data" / "devices"
+    assert not (data / "sw1/interfaces/ge-0-0-1.json").exists()
+    assert (data / "sw1/interfaces/ge-0-0-9.json").exists()
+    assert not service.resync
+
+
+def test_refused_webhook_runs_full_export(service, fake_nb, repo_path):
+    service.batcher.max_pending = 0
+    service.full_timeout = 0
+    fake_nb.dcim.interfaces.records[0]["name"] = "ge-0/0/9"
+    status = syncservice.send_webhook(service.url, "interface", 11, secret="s3cret")
+    assert status == 503
+
+    _wait_for(lambda: service.repo.rev_list("--count", "HEAD") == "2")
+    data = Path(repo_path) / "data" / "devices"
+    assert (data / "sw1/interfaces/ge-0-0-9.json").exists()
+
+
+def test_webhook_rejects_bad_signature(service):
+    assert syncservice.send_webhook(service.url, "interface", 11) == 403
+    assert syncservice.send_webhook(service.url, "tenant", 7, secret="s3cret") == 200
+
+
+def test_push_retried_until_remote_accepts(nbx, repo_path, git_identity, tmp_path):
+    repo = gitstuff.load_repo(repo_path)
+    (Path(repo_path) / "f").write_text("1")
+    gitstuff.commit_all(repo, "first")
+    svc = syncservice.SyncService(
+        nbx,
+        repo,
+        Path(repo_path) / "data",
+        branch=repo.symbolic_ref("--short", "HEAD"),
+        remotes=["mirror"],
+        port=0,
+    )
+    try:
+        assert svc._push_due()
+        assert not svc.push()
+        assert svc.unpushed == {"mirror"}
+        assert not svc._push_due()
+
+        git.Repo.init(path=str(tmp_path / "mirror"), bare=True)
+        repo.remote("add", "mirror", str(tmp_path / "mirror"))
+        assert svc.push()
+        assert svc.unpushed == set()
+    finally:
+        svc.server.server_close()